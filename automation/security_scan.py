@@ -7,7 +7,7 @@ Author: Shirin Bashar
 Date: December 9, 2024
 
 This script performs the following automated security checks:
-1. Bandit SAST scan with JSON and HTML reports
+1. Bandit SAST scan with JSON, TXT and HTML reports
 2. Dependency vulnerability check
 3. API configuration validation
 4. Security summary report generation
@@ -16,201 +16,474 @@ Usage:
     python automation/security_scan.py
     python automation/security_scan.py --verbose
     python automation/security_scan.py --export-only
+    python automation/security_scan.py --diff
 """
 
-import os
+import re
+import ast
 import sys
 import json
+import shutil
+import hashlib
 import subprocess
 import argparse
+import fnmatch
+import linecache
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import bandit
+    from bandit.core import config as bandit_config
+    from bandit.core import constants as bandit_constants
+    from bandit.core import manager as bandit_manager
+except ImportError:
+    bandit_manager = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Source markers looked for in src/app.py when it cannot be parsed
+APP_MARKERS = re.compile(
+    rb"(?P<guardrails>from guardrails import Guard)"
+    rb"|(?P<phoenix>(?:import|from) phoenix)"
+    rb"|(?P<validate>\.validate\()"
+    rb"|(?P<pii>DetectPII)"
+    rb"|(?P<toxic>ToxicLanguage)"
+    rb"|(?P<debug>debug=True)"
+)
+
+
+# Security posture rules, checked in order: (predicate(high, medium), posture, score)
+POSTURE_THRESHOLDS = [
+    (lambda high, medium: high > 0, "NEEDS ATTENTION", 60),
+    (lambda high, medium: medium > 2, "FAIR", 75),
+    (lambda high, medium: True, "GOOD", 90),
+]
+
+
+def _load_json(path):
+    """Load a JSON file, using orjson when installed"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _dump_json(data, path):
+    """Write data as indented JSON, using orjson when installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+
+# Number of Bandit report sets kept in security-reports/.cache/
+CACHE_ENTRIES = 5
+
 
 class SecurityScanner:
     """Automated security scanner for Python applications"""
 
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, diff=False, diff_base="origin/main", use_cache=True):
         self.verbose = verbose
+        self.use_cache = use_cache
+        self.diff = diff
+        self.diff_base = diff_base
         self.results = {
             "scan_timestamp": datetime.now().isoformat(),
             "checks_performed": [],
             "findings": [],
             "summary": {}
         }
-        self.project_root = Path(__file__).parent.parent
+        # Resolve every path the checks use once, up front
+        self.project_root = Path(__file__).resolve().parent.parent
+        self.src_dir = self.project_root / "src"
+        self.app_file = self.src_dir / "app.py"
+        self.env_file = self.project_root / ".env"
+        self.gitignore = self.project_root / ".gitignore"
         self.reports_dir = self.project_root / "security-reports"
         self.reports_dir.mkdir(exist_ok=True)
+        self.cache_dir = self.reports_dir / ".cache"
+        self._log_lock = threading.Lock()
+        self._app_markers = None
+        self._app_markers_lock = threading.Lock()
 
     def log(self, message, level="INFO"):
         """Print log message if verbose mode enabled"""
         if self.verbose or level == "ERROR":
             timestamp = datetime.now().strftime("%H:%M:%S")
-            print(f"[{timestamp}] {level}: {message}")
+            # Checks log from worker threads; keep each line intact
+            with self._log_lock:
+                print(f"[{timestamp}] {level}: {message}")
 
-    def run_bandit_scan(self):
-        """Run Bandit SAST scan on source code"""
-        self.log("Running Bandit SAST scan...")
+    def _changed_source_files(self):
+        """List Python files under src/ added or modified since diff_base
 
+        Returns None when the changes cannot be determined (e.g. not a git
+        worktree or the base ref is missing), so callers can fall back to
+        a full scan.
+        """
         try:
-            # Run Bandit with JSON output
-            json_report = self.reports_dir / "bandit_report.json"
-            txt_report = self.reports_dir / "bandit_report.txt"
-            html_report = self.reports_dir / "bandit_report.html"
-
-            # JSON report
-            result_json = subprocess.run(
-                ["bandit", "-r", "src/", "-f", "json", "-o", str(json_report)],
+            output = subprocess.run(
+                ["git", "diff", "--name-only", "--diff-filter=AM", f"{self.diff_base}...HEAD"],
                 capture_output=True,
                 text=True,
+                check=True,
                 cwd=self.project_root
-            )
+            ).stdout
+        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            self.log(f"Could not diff against {self.diff_base}, scanning full tree: {e}", "WARNING")
+            return None
+
+        return [
+            str(self.project_root / name)
+            for name in output.split()
+            if name.startswith("src/") and name.endswith(".py")
+        ]
+
+    def _source_hash(self, targets):
+        """Hash the Bandit version plus the path and contents of every scanned file"""
+        h = hashlib.blake2b()
+        h.update(bandit.__version__.encode())
+        files = set()
+        for target in targets:
+            target = Path(target).resolve()
+            files.update(target.rglob("*.py") if target.is_dir() else [target])
+        # Stream each file through a reused buffer rather than reading it whole
+        buf = bytearray(64 * 1024)
+        view = memoryview(buf)
+        for path in sorted(files):
+            # Hash paths relative to the project so the key is the same from any cwd
+            h.update(path.relative_to(self.project_root).as_posix().encode())
+            with open(path, 'rb') as f:
+                while n := f.readinto(buf):
+                    h.update(view[:n])
+        return h.hexdigest()
+
+    def _relative_path(self, path):
+        """Return path relative to project_root (POSIX style) if it lies inside it"""
+        try:
+            return Path(path).resolve().relative_to(self.project_root).as_posix()
+        except ValueError:
+            return str(path)
+
+    def _relativize_bandit_paths(self, b_mgr):
+        """Rewrite a finished BanditManager's filenames relative to project_root
+
+        Bandit is given absolute targets so discovery does not depend on the
+        working directory; reports should still say src/app.py rather than a
+        machine-specific path. Issue code snippets are read through linecache,
+        so each file's lines are registered under the relative name too.
+        """
+        for issue in b_mgr.results:
+            rel = self._relative_path(issue.fname)
+            if rel not in linecache.cache:
+                lines = linecache.getlines(issue.fname)
+                linecache.cache[rel] = (sum(map(len, lines)), None, lines, issue.fname)
+            issue.fname = rel
+        b_mgr.metrics.data = {
+            key if key == "_totals" else self._relative_path(key): value
+            for key, value in b_mgr.metrics.data.items()
+        }
+        b_mgr.files_list = [self._relative_path(f) for f in b_mgr.files_list]
+        b_mgr.excluded_files = [self._relative_path(f) for f in b_mgr.excluded_files]
+        b_mgr.skipped = [(self._relative_path(f), reason) for f, reason in b_mgr.get_skipped()]
 
-            # Text report
-            result_txt = subprocess.run(
-                ["bandit", "-r", "src/", "-f", "txt", "-o", str(txt_report)],
-                capture_output=True,
-                text=True,
-                cwd=self.project_root
-            )
+    def _prune_cache(self, keep=CACHE_ENTRIES):
+        """Delete all but the `keep` most recently written Bandit cache entries"""
+        entries = sorted((p for p in self.cache_dir.iterdir() if p.is_dir()),
+                         key=lambda p: p.stat().st_mtime, reverse=True)
+        for entry in entries[keep:]:
+            shutil.rmtree(entry, ignore_errors=True)
 
-            # HTML report
-            result_html = subprocess.run(
-                ["bandit", "-r", "src/", "-f", "html", "-o", str(html_report)],
-                capture_output=True,
-                text=True,
-                cwd=self.project_root
-            )
+    def run_bandit_scan(self):
+        """Run Bandit SAST scan on source code
 
-            # Parse JSON results
-            if json_report.exists():
-                with open(json_report, 'r') as f:
-                    bandit_data = json.load(f)
+        Returns a (check label, finding) pair, or None if the scan failed.
+        """
+        self.log("Running Bandit SAST scan...")
 
-                metrics = bandit_data.get("metrics", {}).get("_totals", {})
+        if bandit_manager is None:
+            self.log("Bandit not installed. Run: pip install bandit", "ERROR")
+            return None
 
-                self.results["checks_performed"].append("Bandit SAST Scan")
-                self.results["findings"].append({
-                    "check": "Bandit SAST",
-                    "status": "COMPLETED",
-                    "high_severity": metrics.get("SEVERITY.HIGH", 0),
-                    "medium_severity": metrics.get("SEVERITY.MEDIUM", 0),
-                    "low_severity": metrics.get("SEVERITY.LOW", 0),
-                    "total_issues": metrics.get("SEVERITY.HIGH", 0) +
-                                    metrics.get("SEVERITY.MEDIUM", 0) +
-                                    metrics.get("SEVERITY.LOW", 0),
-                    "report_path": str(json_report)
-                })
-
-                self.log(f"✓ Bandit scan completed. Found {metrics.get('SEVERITY.HIGH', 0)} high, "
-                         f"{metrics.get('SEVERITY.MEDIUM', 0)} medium, "
-                         f"{metrics.get('SEVERITY.LOW', 0)} low severity issues")
-
-                return True
+        try:
+            json_report = self.reports_dir / "bandit_report.json"
+            txt_report = self.reports_dir / "bandit_report.txt"
+            html_report = self.reports_dir / "bandit_report.html"
+
+            reports = {"json": json_report, "txt": txt_report, "html": html_report}
+
+            targets = self._changed_source_files() if self.diff else None
+            if targets is None:
+                targets = [str(self.src_dir)]
+            else:
+                self.log(f"Diff mode: scanning {len(targets)} changed file(s) since {self.diff_base}")
+
+            # Reports are cached by source hash, so unchanged trees skip analysis
+            cache_entry = self.cache_dir / self._source_hash(targets) if self.use_cache else None
+            cached = cache_entry is not None and all((cache_entry / r.name).exists() for r in reports.values())
+            if cached:
+                for report in reports.values():
+                    shutil.copyfile(cache_entry / report.name, report)
+                bandit_data = _load_json(json_report)
+                metrics = bandit_data.get("metrics", {}).get("_totals", {})
+                # The copied reports keep the timestamp of the run that produced them
+                generated_at = bandit_data.get("generated_at")
+                self.log(f"✓ Source unchanged, reusing cached Bandit reports generated at {generated_at}")
             else:
-                self.log("Bandit report not generated", "ERROR")
-                return False
+                # Drive Bandit in-process: the tree is analysed once and each
+                # report is just a formatter pass over the same results
+                b_mgr = bandit_manager.BanditManager(bandit_config.BanditConfig(), "file")
+                b_mgr.discover_files(targets, True, ",".join(bandit_constants.EXCLUDE))
+                b_mgr.run_tests()
+                self._relativize_bandit_paths(b_mgr)
+
+                for output_format, report in reports.items():
+                    with open(report, 'w', encoding='utf-8') as f:
+                        b_mgr.output_results(3, "UNDEFINED", "UNDEFINED", f, output_format)
+
+                metrics = b_mgr.metrics.data["_totals"]
+
+                if cache_entry is not None:
+                    cache_entry.mkdir(parents=True, exist_ok=True)
+                    for report in reports.values():
+                        shutil.copyfile(report, cache_entry / report.name)
+                    self._prune_cache()
+
+            finding = {
+                "check": "Bandit SAST",
+                "status": "COMPLETED",
+                "high_severity": metrics.get("SEVERITY.HIGH", 0),
+                "medium_severity": metrics.get("SEVERITY.MEDIUM", 0),
+                "low_severity": metrics.get("SEVERITY.LOW", 0),
+                "total_issues": metrics.get("SEVERITY.HIGH", 0) +
+                                metrics.get("SEVERITY.MEDIUM", 0) +
+                                metrics.get("SEVERITY.LOW", 0),
+                "report_path": self._relative_path(json_report),
+                "cached": cached
+            }
+            if cached:
+                finding["report_generated_at"] = generated_at
+
+            self.log(f"✓ Bandit scan completed. Found {metrics.get('SEVERITY.HIGH', 0)} high, "
+                     f"{metrics.get('SEVERITY.MEDIUM', 0)} medium, "
+                     f"{metrics.get('SEVERITY.LOW', 0)} low severity issues")
+
+            return "Bandit SAST Scan", finding
 
-        except FileNotFoundError:
-            self.log("Bandit not installed. Run: pip install bandit", "ERROR")
-            return False
         except Exception as e:
             self.log(f"Bandit scan failed: {str(e)}", "ERROR")
-            return False
+            return None
 
     def check_dependencies(self):
-        """Check for known vulnerabilities in dependencies"""
+        """Check for known vulnerabilities in dependencies
+
+        Returns a (check label, finding) pair, or None if the check was skipped.
+        """
         self.log("Checking dependencies for vulnerabilities...")
 
         try:
+            audit_file = self.reports_dir / "pip_audit.json"
+            # Remove any previous report so a stale file is never counted
+            audit_file.unlink(missing_ok=True)
+
             # Try using pip-audit if available
             result = subprocess.run(
-                ["pip-audit", "--format", "json", "--output",
-                 str(self.reports_dir / "pip_audit.json")],
+                ["pip-audit", "--format", "json", "--output", str(audit_file)],
                 capture_output=True,
                 text=True
             )
 
-            if result.returncode == 0:
-                audit_file = self.reports_dir / "pip_audit.json"
-                if audit_file.exists():
-                    with open(audit_file, 'r') as f:
-                        audit_data = json.load(f)
+            # pip-audit exits 1 when it finds vulnerabilities, so trust the report itself
+            if result.returncode in (0, 1) and audit_file.exists():
+                vuln_count = self._count_audit_vulnerabilities(audit_file)
 
-                    vuln_count = len(audit_data.get("vulnerabilities", []))
-
-                    self.results["checks_performed"].append("Dependency Vulnerability Check")
-                    self.results["findings"].append({
-                        "check": "Dependency Vulnerabilities",
-                        "status": "COMPLETED",
-                        "vulnerabilities_found": vuln_count,
-                        "report_path": str(audit_file)
-                    })
+                finding = {
+                    "check": "Dependency Vulnerabilities",
+                    "status": "COMPLETED",
+                    "vulnerabilities_found": vuln_count,
+                    "report_path": self._relative_path(audit_file)
+                }
 
-                    self.log(f"✓ Dependency check completed. Found {vuln_count} vulnerabilities")
-                    return True
+                self.log(f"✓ Dependency check completed. Found {vuln_count} vulnerabilities")
+                return "Dependency Vulnerability Check", finding
             else:
-                self.log("pip-audit not available, skipping dependency check", "WARNING")
+                self.log(f"pip-audit failed (exit {result.returncode}), skipping dependency check: "
+                         f"{result.stderr.strip()}", "WARNING")
 
         except FileNotFoundError:
             self.log("pip-audit not installed. Install with: pip install pip-audit", "WARNING")
         except Exception as e:
             self.log(f"Dependency check failed: {str(e)}", "WARNING")
 
-        return False
+        return None
+
+    def _count_audit_vulnerabilities(self, audit_file):
+        """Count vulnerabilities in a pip-audit JSON report
+
+        Streams the report with ijson when installed so only one
+        vulnerability entry is held in memory at a time.
+        """
+        if ijson is not None:
+            with open(audit_file, 'rb') as f:
+                return sum(1 for _ in ijson.items(f, "dependencies.item.vulns.item"))
+        audit_data = _load_json(audit_file)
+        return sum(len(dep.get("vulns", [])) for dep in audit_data.get("dependencies", []))
+
+    @staticmethod
+    def _find_ast_markers(tree):
+        """Return the APP_MARKERS group names present in a parsed module
+
+        Walks imports, names and calls rather than raw text, so commented-out
+        code and string literals are not counted.
+        """
+        markers = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                if any(alias.name.split(".")[0] == "phoenix" for alias in node.names):
+                    markers.add("phoenix")
+            elif isinstance(node, ast.ImportFrom):
+                module = (node.module or "").split(".")[0]
+                names = {alias.name for alias in node.names}
+                if module == "guardrails" and "Guard" in names:
+                    markers.add("guardrails")
+                if module == "phoenix":
+                    markers.add("phoenix")
+                if "DetectPII" in names:
+                    markers.add("pii")
+                if "ToxicLanguage" in names:
+                    markers.add("toxic")
+            elif isinstance(node, ast.Name):
+                if node.id == "DetectPII":
+                    markers.add("pii")
+                elif node.id == "ToxicLanguage":
+                    markers.add("toxic")
+            elif isinstance(node, ast.Call):
+                if getattr(node.func, "attr", None) == "validate":
+                    markers.add("validate")
+                for keyword in node.keywords:
+                    if (keyword.arg == "debug" and isinstance(keyword.value, ast.Constant)
+                            and keyword.value.value is True):
+                        markers.add("debug")
+        return markers
+
+    def _scan_app_markers(self):
+        """Return the set of APP_MARKERS group names found in src/app.py
+
+        The file is parsed and walked once; later calls reuse the result.
+        Falls back to a text scan if the file does not parse.
+        Returns None if src/app.py does not exist.
+        """
+        with self._app_markers_lock:
+            if self._app_markers is None:
+                try:
+                    # Bytes work directly with ast.parse and APP_MARKERS, skipping a decode
+                    content = self.app_file.read_bytes()
+                except FileNotFoundError:
+                    return None
+                try:
+                    self._app_markers = self._find_ast_markers(ast.parse(content, str(self.app_file)))
+                except SyntaxError as e:
+                    self.log(f"Could not parse {self.app_file}, falling back to text scan: {e}", "WARNING")
+                    self._app_markers = {match.lastgroup for match in APP_MARKERS.finditer(content)}
+            return self._app_markers
+
+    @staticmethod
+    def _env_rule(line):
+        """Classify a .gitignore line by its effect on .env
+
+        Returns True if the line ignores .env, False if it re-includes it
+        ('!' negation), or None if it does not match .env at all. '.env',
+        '/.env', '*.env' and '**/.env' match; '.env.example' or '.envrc'
+        do not.
+        """
+        pattern = line.strip()
+        if not pattern or pattern.startswith("#"):
+            return None
+        negated = pattern.startswith("!")
+        pattern = pattern.removeprefix("!").removeprefix("/").removeprefix("**/")
+        if not fnmatch.fnmatch(".env", pattern):
+            return None
+        return not negated
+
+    def _gitignore_ignores_env(self):
+        """Return True if .gitignore leaves .env ignored
+
+        As in git, the last matching rule wins, so a later '!.env' undoes
+        an earlier '.env'.
+        """
+        ignored = False
+        with open(self.gitignore, 'r', encoding='utf-8') as f:
+            for line in f:
+                rule = self._env_rule(line)
+                if rule is not None:
+                    ignored = rule
+        return ignored
 
     def validate_api_configuration(self):
-        """Validate Flask API security configuration"""
+        """Validate Flask API security configuration
+
+        Returns a (check label, finding) pair.
+        """
         self.log("Validating API configuration...")
 
         issues = []
 
         # Check if .env file exists
-        env_file = self.project_root / ".env"
-        if not env_file.exists():
+        if not self.env_file.exists():
             issues.append("Missing .env file - API keys may be exposed")
         else:
             self.log("✓ .env file found")
 
         # Check if .gitignore includes .env
-        gitignore = self.project_root / ".gitignore"
-        if gitignore.exists():
-            with open(gitignore, 'r', encoding='utf-8') as f:
-                gitignore_content = f.read()
-                if ".env" not in gitignore_content:
-                    issues.append(".env not in .gitignore - credentials at risk")
-                else:
-                    self.log("✓ .env is in .gitignore")
+        if self.gitignore.exists():
+            if not self._gitignore_ignores_env():
+                issues.append(".env not in .gitignore - credentials at risk")
+            else:
+                self.log("✓ .env is in .gitignore")
         else:
             issues.append("Missing .gitignore file")
 
         # Check for debug mode in app.py
-        app_file = self.project_root / "src" / "app.py"
-        if app_file.exists():
-            with open(app_file, 'r', encoding='utf-8') as f:
-                app_content = f.read()
-                if "debug=True" in app_content:
-                    issues.append("Flask debug mode enabled - unsafe for production")
-                else:
-                    self.log("✓ Flask debug mode not hardcoded")
-
-        self.results["checks_performed"].append("API Configuration Validation")
-        self.results["findings"].append({
+        markers = self._scan_app_markers()
+        if markers is not None:
+            if "debug" in markers:
+                issues.append("Flask debug mode enabled - unsafe for production")
+            else:
+                self.log("✓ Flask debug mode not hardcoded")
+
+        finding = {
             "check": "API Configuration",
             "status": "COMPLETED",
             "issues_found": len(issues),
             "issues": issues
-        })
+        }
 
         if issues:
             self.log(f"⚠ Configuration check found {len(issues)} issues", "WARNING")
         else:
             self.log("✓ Configuration validation passed")
 
-        return True
+        return "API Configuration Validation", finding
 
     def check_security_controls(self):
-        """Verify security controls are in place"""
+        """Verify security controls are in place
+
+        Returns a (check label, finding) pair.
+        """
         self.log("Checking security controls...")
 
         controls = {
@@ -221,36 +494,27 @@ class SecurityScanner:
             "Toxic Content Filter": False
         }
 
-        app_file = self.project_root / "src" / "app.py"
-        if app_file.exists():
-            with open(app_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-                if "from guardrails import Guard" in content:
-                    controls["Guardrails AI"] = True
-                if "import phoenix" in content or "from phoenix" in content:
-                    controls["Phoenix Observability"] = True
-                if "guard.validate" in content:
-                    controls["Input Validation"] = True
-                if "DetectPII" in content:
-                    controls["PII Detection"] = True
-                if "ToxicLanguage" in content:
-                    controls["Toxic Content Filter"] = True
+        markers = self._scan_app_markers()
+        if markers is not None:
+            controls["Guardrails AI"] = "guardrails" in markers
+            controls["Phoenix Observability"] = "phoenix" in markers
+            controls["Input Validation"] = "validate" in markers
+            controls["PII Detection"] = "pii" in markers
+            controls["Toxic Content Filter"] = "toxic" in markers
 
         enabled_controls = sum(controls.values())
         total_controls = len(controls)
 
-        self.results["checks_performed"].append("Security Controls Verification")
-        self.results["findings"].append({
+        finding = {
             "check": "Security Controls",
             "status": "COMPLETED",
             "controls_enabled": enabled_controls,
             "total_controls": total_controls,
             "details": controls
-        })
+        }
 
         self.log(f"✓ Security controls check: {enabled_controls}/{total_controls} enabled")
-        return True
+        return "Security Controls Verification", finding
 
     def generate_summary_report(self):
         """Generate executive summary report"""
@@ -260,23 +524,13 @@ class SecurityScanner:
         total_checks = len(self.results["checks_performed"])
 
         # Count high severity issues from Bandit
-        high_issues = 0
-        medium_issues = 0
-        for finding in self.results["findings"]:
-            if finding["check"] == "Bandit SAST":
-                high_issues = finding.get("high_severity", 0)
-                medium_issues = finding.get("medium_severity", 0)
-
-        # Determine security posture
-        if high_issues > 0:
-            posture = "NEEDS ATTENTION"
-            score = 60
-        elif medium_issues > 2:
-            posture = "FAIR"
-            score = 75
-        else:
-            posture = "GOOD"
-            score = 90
+        bandit = next((f for f in self.results["findings"] if f["check"] == "Bandit SAST"), {})
+        high_issues = bandit.get("high_severity", 0)
+        medium_issues = bandit.get("medium_severity", 0)
+
+        # Determine security posture from the first matching threshold
+        posture, score = next((posture, score) for matches, posture, score in POSTURE_THRESHOLDS
+                              if matches(high_issues, medium_issues))
 
         self.results["summary"] = {
             "security_posture": posture,
@@ -289,8 +543,7 @@ class SecurityScanner:
 
         # Write summary to file
         summary_file = self.reports_dir / "security_summary.json"
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2)
+        _dump_json(self.results, summary_file)
 
         # Generate markdown report
         self._generate_markdown_report()
@@ -307,52 +560,56 @@ class SecurityScanner:
         }
         return recommendations.get(posture, "Review findings and implement recommended fixes.")
 
+    @staticmethod
+    def _format_finding_issues(finding):
+        """Summarise a finding's issue count for the markdown findings table"""
+        if "high_severity" in finding:
+            return f"{finding['high_severity']} High, {finding['medium_severity']} Medium"
+        elif "vulnerabilities_found" in finding:
+            return f"{finding['vulnerabilities_found']} vulnerabilities"
+        elif "issues_found" in finding:
+            return f"{finding['issues_found']} issues"
+        return "N/A"
+
     def _generate_markdown_report(self):
         """Generate human-readable markdown report"""
         md_file = self.reports_dir / "security_summary.md"
+        summary = self.results["summary"]
 
-        with open(md_file, 'w', encoding='utf-8') as f:
-            f.write("# Security Scan Summary Report\n\n")
-            f.write(f"**Scan Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"**Project:** LLM Guardrails Demo API\n\n")
-
-            f.write("## Overall Security Posture\n\n")
-            posture = self.results["summary"]["security_posture"]
-            score = self.results["summary"]["security_score"]
-            f.write(f"**Status:** {posture}  \n")
-            f.write(f"**Security Score:** {score}/100\n\n")
-
-            f.write("## Checks Performed\n\n")
-            for check in self.results["checks_performed"]:
-                f.write(f"- ✓ {check}\n")
-            f.write("\n")
-
-            f.write("## Findings Summary\n\n")
-            f.write("| Check | Status | Issues Found |\n")
-            f.write("|-------|--------|-------------|\n")
-
-            for finding in self.results["findings"]:
-                check_name = finding["check"]
-                status = finding["status"]
-
-                if "high_severity" in finding:
-                    issues = f"{finding['high_severity']} High, {finding['medium_severity']} Medium"
-                elif "vulnerabilities_found" in finding:
-                    issues = f"{finding['vulnerabilities_found']} vulnerabilities"
-                elif "issues_found" in finding:
-                    issues = f"{finding['issues_found']} issues"
-                else:
-                    issues = "N/A"
-
-                f.write(f"| {check_name} | {status} | {issues} |\n")
-
-            f.write("\n## Recommendation\n\n")
-            f.write(self.results["summary"]["recommendation"])
-            f.write("\n\n## Detailed Reports\n\n")
-            f.write("Full reports available in `security-reports/` directory:\n")
-            f.write("- `bandit_report.html` - Interactive SAST findings\n")
-            f.write("- `bandit_report.json` - Machine-readable SAST results\n")
-            f.write("- `security_summary.json` - Complete scan results\n")
+        parts = [
+            "# Security Scan Summary Report\n\n",
+            f"**Scan Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "**Project:** LLM Guardrails Demo API\n\n",
+
+            "## Overall Security Posture\n\n",
+            f"**Status:** {summary['security_posture']}  \n",
+            f"**Security Score:** {summary['security_score']}/100\n\n",
+
+            "## Checks Performed\n\n",
+        ]
+        parts.extend(f"- ✓ {check}\n" for check in self.results["checks_performed"])
+        parts.append("\n")
+
+        parts.append("## Findings Summary\n\n")
+        parts.append("| Check | Status | Issues Found |\n")
+        parts.append("|-------|--------|-------------|\n")
+        parts.extend(
+            f"| {finding['check']} | {finding['status']}{' (cached)' if finding.get('cached') else ''} "
+            f"| {self._format_finding_issues(finding)} |\n"
+            for finding in self.results["findings"]
+        )
+
+        parts.extend([
+            "\n## Recommendation\n\n",
+            summary["recommendation"],
+            "\n\n## Detailed Reports\n\n",
+            "Full reports available in `security-reports/` directory:\n",
+            "- `bandit_report.html` - Interactive SAST findings\n",
+            "- `bandit_report.json` - Machine-readable SAST results\n",
+            "- `security_summary.json` - Complete scan results\n",
+        ])
+
+        md_file.write_text("".join(parts), encoding='utf-8')
 
         self.log(f"✓ Markdown report saved to {md_file}")
 
@@ -366,11 +623,27 @@ class SecurityScanner:
         print("=" * 70)
         print()
 
-        # Run all checks
-        self.run_bandit_scan()
-        self.check_dependencies()
-        self.validate_api_configuration()
-        self.check_security_controls()
+        # Run all checks concurrently; they share no state until results are collected
+        checks = [
+            self.run_bandit_scan,
+            self.check_dependencies,
+            self.validate_api_configuration,
+            self.check_security_controls,
+        ]
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = {executor.submit(check): check for check in checks}
+            outcomes = {}
+            for future in as_completed(futures):
+                outcomes[futures[future]] = future.result()
+
+        # Record results on the main thread, in a stable order
+        for check in checks:
+            outcome = outcomes[check]
+            if outcome is not None:
+                label, finding = outcome
+                self.results["checks_performed"].append(label)
+                self.results["findings"].append(finding)
+
         self.generate_summary_report()
 
         # Print summary
@@ -400,10 +673,17 @@ def main():
                         help="Enable verbose output")
     parser.add_argument("--export-only", action="store_true",
                         help="Only generate reports from existing scan data")
+    parser.add_argument("--diff", action="store_true",
+                        help="Only run Bandit on src/ files changed since the diff base")
+    parser.add_argument("--diff-base", default="origin/main",
+                        help="Git ref to diff against in --diff mode (default: origin/main)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always re-run Bandit instead of reusing cached reports")
 
     args = parser.parse_args()
 
-    scanner = SecurityScanner(verbose=args.verbose)
+    scanner = SecurityScanner(verbose=args.verbose, diff=args.diff, diff_base=args.diff_base,
+                              use_cache=not args.no_cache)
 
     if args.export_only:
         scanner.generate_summary_report()
@@ -1,29 +1,54 @@
 import os
-from flask import Flask, request, jsonify
-from openai import OpenAI
+import re
+import httpx
+import orjson
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
+from openai import DefaultHttpxClient, OpenAI
 from dotenv import load_dotenv
-from guardrails import Guard
-from guardrails.hub import ToxicLanguage, DetectPII
+from waitress import serve
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Phoenix for local observability
-import phoenix as px
+# Phoenix for local observability (traces are exported to a separate Phoenix server)
 from phoenix.otel import register
 from openinference.instrumentation.openai import OpenAIInstrumentor
 
 # Load environment variables
 load_dotenv()
 
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster jsonify/request.json"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Flask setup
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
-# OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI client: one pooled HTTP/2 client shared by all server threads, so
+# concurrent /ask requests reuse keep-alive connections instead of new TLS handshakes.
+# DefaultHttpxClient keeps the SDK's transport defaults (redirects, timeouts).
+http_client = DefaultHttpxClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=100)
+)
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 
-# Launch Phoenix locally (opens web UI at http://localhost:6006)
-session = px.launch_app()
+# Phoenix runs as its own process (`phoenix serve`), not inside the API worker;
+# the tracer below reads PHOENIX_COLLECTOR_ENDPOINT to find it
+os.environ.setdefault("PHOENIX_COLLECTOR_ENDPOINT", "http://localhost:6006")
+# Dashboard URL shown to users; the collector endpoint may be an internal address
+PHOENIX_UI_URL = os.getenv("PHOENIX_UI_URL", "http://localhost:6006")
 
-# Register Phoenix tracer (sends to local Phoenix server)
+# Register Phoenix tracer (sends to the Phoenix server)
 tracer_provider = register(
     project_name="llm-guardrails-demo",
 )
@@ -31,11 +56,101 @@ tracer_provider = register(
 # Instrument OpenAI for automatic tracing
 OpenAIInstrumentor().instrument(tracer_provider=tracer_provider)
 
+
 # Guardrails setup
-guard = Guard().use_many(
-    ToxicLanguage(threshold=0.5, validation_method="sentence", on_fail="exception"),
-    DetectPII(pii_entities=["EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD"], on_fail="fix")
-)
+class GuardrailsUnavailable(RuntimeError):
+    """Raised when the Guardrails validators could not be built"""
+
+
+_guards = None
+_guards_error = None
+_guards_lock = threading.Lock()
+
+
+def _get_guards():
+    """
+    Return the shared (toxic_guard, pii_guard) pair, building it on first use.
+
+    Only the first build takes the lock, so concurrent first requests wait
+    for a single build instead of each loading the validator models. A
+    failed build is recorded and raised as GuardrailsUnavailable on every
+    call, so requests are not mistaken for content rejections.
+    """
+    global _guards, _guards_error
+    if _guards is None:
+        with _guards_lock:
+            if _guards is None and _guards_error is None:
+                try:
+                    _guards = _build_guards()
+                except Exception as e:
+                    _guards_error = e
+    if _guards_error is not None:
+        raise GuardrailsUnavailable(f"Guardrails unavailable: {_guards_error}") from _guards_error
+    return _guards
+
+
+def _build_guards():
+    """
+    Build the toxicity and PII guards.
+
+    Guardrails and its hub validators are heavy to import and initialize,
+    so they are loaded here rather than at module import. The guards are
+    independent so the two checks can run in parallel.
+    """
+    from guardrails import Guard
+    from guardrails.hub import ToxicLanguage, DetectPII
+
+    toxic_guard = Guard().use(
+        ToxicLanguage(threshold=0.5, validation_method="sentence", on_fail="exception")
+    )
+    pii_guard = Guard().use(
+        DetectPII(pii_entities=["EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD"], on_fail="fix")
+    )
+    for g in (toxic_guard, pii_guard):
+        g.configure(num_reasks=0)
+    return toxic_guard, pii_guard
+
+
+# Shared pool for guard validations (two per validated text, per server thread)
+validation_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="guardrails")
+
+
+def _run_guard(g, text):
+    return g.validate(text)
+
+
+def validate_text(text):
+    """
+    Run the toxicity and PII guards concurrently on the same text.
+
+    Raises if the toxicity guard rejects the text; otherwise returns the
+    text with PII redacted.
+    """
+    toxic_guard, pii_guard = _get_guards()
+    futures = {
+        validation_pool.submit(_run_guard, toxic_guard, text): "toxic",
+        validation_pool.submit(_run_guard, pii_guard, text): "pii",
+    }
+    validated_text = text
+    for future in as_completed(futures):
+        result = future.result()
+        if futures[future] == "pii" and hasattr(result, 'validated_output'):
+            validated_text = result.validated_output
+    return validated_text
+
+
+def warm_up_guard():
+    """
+    Build the guards and run one validation so validator models are loaded
+    before the first request.
+
+    Runs on the calling thread rather than validation_pool, so it is safe to
+    call in a preloading server's master process (e.g. gunicorn --preload)
+    before workers fork and inherit the warm guards. Raises if the guards
+    cannot be built or run, so the server does not start without them.
+    """
+    for g in _get_guards():
+        _run_guard(g, "warmup")
 
 
 @app.route("/ask", methods=["POST"])
@@ -66,10 +181,11 @@ def ask():
     try:
         # Step 1: Validate input with Guardrails
         try:
-            validated_prompt = guard.validate(prompt)
-            if hasattr(validated_prompt, 'validated_output'):
-                prompt = validated_prompt.validated_output
+            prompt = validate_text(prompt)
             guardrails_actions.append("Input validation passed")
+        except GuardrailsUnavailable as e:
+            # Validators failed to load: a server fault, not a content rejection
+            return jsonify({"error": str(e), "prediction_id": prediction_id}), 503
         except Exception as guard_error:
             guardrails_passed = False
             guardrails_actions.append(f"Input validation failed: {str(guard_error)}")
@@ -97,9 +213,7 @@ def ask():
 
         # Step 3: Validate output with Guardrails
         try:
-            validated_response = guard.validate(response_text)
-            if hasattr(validated_response, 'validated_output'):
-                response_text = validated_response.validated_output
+            response_text = validate_text(response_text)
             guardrails_actions.append("Output validation passed")
         except Exception as guard_error:
             guardrails_passed = False
@@ -120,20 +234,138 @@ def ask():
         "guardrails_actions": guardrails_actions,
         "model": "gpt-4o-mini",
         "user_id": user_id,
-        "phoenix_url": "http://localhost:6006"
+        "phoenix_url": PHOENIX_UI_URL
     })
 
 
+# Sentence boundary for streamed output: terminator followed by whitespace.
+# The whitespace is captured so it can be sent on with the sentence.
+SENTENCE_END = re.compile(r"(?<=[.!?])(\s+)")
+
+
+def _sse(payload):
+    """Format a payload as a server-sent event"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+def _stream_sentences(stream):
+    """Yield (sentence, trailing whitespace) pairs from a streamed chat completion"""
+    buffer = ""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        buffer += chunk.choices[0].delta.content or ""
+        *parts, buffer = SENTENCE_END.split(buffer)
+        yield from zip(parts[::2], parts[1::2])
+    if buffer.strip():
+        yield buffer, ""
+
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_stream():
+    """
+    Streaming variant of /ask: the OpenAI response is streamed and each
+    sentence is validated with Guardrails as soon as it is complete.
+
+    Request body is the same as /ask. Responds with text/event-stream
+    events of type "sentence", then "done", or "error" if the stream
+    is stopped.
+    """
+    data = request.json or {}
+    prompt = data.get("prompt", "").strip()
+    user_id = data.get("user_id", "anonymous")
+
+    if not prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    prediction_id = str(uuid.uuid4())
+
+    # Validate input with Guardrails before anything is streamed
+    try:
+        prompt = validate_text(prompt)
+    except GuardrailsUnavailable as e:
+        # Validators failed to load: a server fault, not a content rejection
+        return jsonify({"error": str(e), "prediction_id": prediction_id}), 503
+    except Exception as guard_error:
+        return jsonify({
+            "error": f"Guardrails blocked request: {str(guard_error)}",
+            "guardrails_passed": False,
+            "actions": [f"Input validation failed: {str(guard_error)}"],
+            "prediction_id": prediction_id
+        }), 400
+
+    def generate():
+        try:
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=500,
+                temperature=0.7,
+                stream=True
+            )
+        except Exception as e:
+            yield _sse({"type": "error", "error": f"API Error: {str(e)}"})
+            return
+
+        try:
+            # Upstream (OpenAI/network) errors surface from this iterator
+            for sentence, sep in _stream_sentences(stream):
+                try:
+                    text = validate_text(sentence)
+                except Exception as guard_error:
+                    # Stop generating as soon as a sentence fails validation
+                    yield _sse({
+                        "type": "error",
+                        "error": f"Output validation stopped response: {str(guard_error)}",
+                        "guardrails_passed": False,
+                        "prediction_id": prediction_id
+                    })
+                    return
+                yield _sse({"type": "sentence", "text": text + sep})
+        except Exception as e:
+            yield _sse({
+                "type": "error",
+                "error": f"API Error: {str(e)}",
+                "prediction_id": prediction_id
+            })
+            return
+        finally:
+            # Also runs on GeneratorExit when the client disconnects
+            stream.close()
+
+        yield _sse({
+            "type": "done",
+            "prediction_id": prediction_id,
+            "guardrails_passed": True,
+            "model": "gpt-4o-mini",
+            "user_id": user_id
+        })
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream")
+
+
 @app.route("/health", methods=["GET"])
 def health():
     """Health check endpoint"""
+    guardrails_ok = _guards_error is None
     return jsonify({
-        "status": "healthy",
-        "guardrails_enabled": True,
+        "status": "healthy" if guardrails_ok else "unhealthy",
+        "guardrails_enabled": guardrails_ok,
         "phoenix_observability": True,
-        "phoenix_url": "http://localhost:6006",
+        "phoenix_url": PHOENIX_UI_URL,
         "project": "llm-guardrails-demo"
-    })
+    }), 200 if guardrails_ok else 503
+
+
+# Set GUARDRAILS_WARMUP_ON_IMPORT=true when serving through a WSGI server
+# (e.g. gunicorn --preload) so guards are warmed once in the importing process
+# A failure raises here, so the server does not start without Guardrails
+WARM_UP_ON_IMPORT = os.getenv("GUARDRAILS_WARMUP_ON_IMPORT", "false").lower() == "true"
+if WARM_UP_ON_IMPORT:
+    warm_up_guard()
 
 
 if __name__ == "__main__":
@@ -147,15 +379,25 @@ if __name__ == "__main__":
     print("=" * 70)
     print("\n📡 API Endpoints:")
     print("  POST /ask - Main LLM endpoint with guardrails")
+    print("  POST /ask/stream - Streaming variant, validated sentence by sentence")
     print("  GET /health - Health check")
     print("\n🔍 Phoenix Dashboard:")
-    print("  http://localhost:6006")
+    print(f"  {PHOENIX_UI_URL}")
     print("  View traces, spans, and LLM performance metrics in real-time!")
     print("\n🛡️ Guardrails Enabled:")
     print("  ✓ Toxic language detection & blocking")
     print("  ✓ PII detection & redaction")
-    print("\n💡 Tip: Open http://localhost:6006 in your browser to see traces!")
+    print(f"\n💡 Tip: Open {PHOENIX_UI_URL} in your browser to see traces!")
     print("=" * 70)
+    if not WARM_UP_ON_IMPORT:
+        print("\nWarming up guardrails...")
+        try:
+            warm_up_guard()
+        except Exception as e:
+            print(f"ERROR: Guardrails failed to load: {e}")
+            exit(1)
     print("\nStarting server...\n")
 
-    app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
+    # Serve with waitress: no debugger/reloader, and a worker thread pool so
+    # concurrent /ask requests can overlap while waiting on OpenAI
+    serve(app, host="0.0.0.0", port=8080, threads=16)
\ No newline at end of file